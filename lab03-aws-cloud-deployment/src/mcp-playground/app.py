@@ -366,6 +366,37 @@ def get_bedrock_tool_config() -> Dict:
 # STATE MACHINE IMPLEMENTATION
 # ------------------------------------------------
 
+def stream_bedrock_response(conversation_manager: ConversationManager, **converse_args) -> Dict:
+    """
+    Call Bedrock converse_stream, rendering text as it arrives.
+    
+    Args:
+        conversation_manager: Manager that assembles and records the response
+        **converse_args: Arguments passed through to converse_stream
+        
+    Returns:
+        The result of the manager's stream processing
+    """
+    response = bedrock_runtime.converse_stream(**converse_args)
+    
+    placeholder = None
+    streamed_text = ""
+    for event in response["stream"]:
+        if "contentBlockDelta" in event:
+            text = event["contentBlockDelta"].get("delta", {}).get("text")
+            if text:
+                # Open the assistant bubble on the first token
+                if placeholder is None:
+                    placeholder = st.chat_message("assistant").empty()
+                streamed_text += text
+                placeholder.markdown(streamed_text)
+        
+        result = conversation_manager.process_bedrock_stream_event(event)
+        if result is not None:
+            return result
+    
+    raise RuntimeError("Bedrock stream ended without a messageStop event")
+
 def process_conversation_state():
     """
     Process the current conversation state and take appropriate actions.
@@ -490,7 +521,7 @@ def continue_conversation():
             tool_config = get_bedrock_tool_config()
             
             # Call Bedrock
-            logger.info(f"Calling Bedrock converse with {len(messages)} messages")
+            logger.info(f"Calling Bedrock converse_stream with {len(messages)} messages")
             
             # Log first few messages for debugging
             for i, msg in enumerate(messages[-3:] if len(messages) > 3 else messages):
@@ -501,7 +532,8 @@ def continue_conversation():
             
             # Make API call
             start_time = time.time()
-            response = bedrock_runtime.converse(
+            result = stream_bedrock_response(
+                conversation_manager,
                 modelId=st.session_state.model_id,
                 messages=messages,
                 system=system_prompt,
@@ -514,16 +546,6 @@ def continue_conversation():
             duration = time.time() - start_time
             
             logger.info(f"Bedrock API call completed in {duration:.2f} seconds")
-            logger.info(f"Bedrock response: {json.dumps(response, default=str)[:500]}...")
-            
-            # Process the response
-            result = conversation_manager.process_bedrock_response(response)
-            logger.info(f"Processed response: {json.dumps(result, default=str)[:500]}...")
-            
-            # If there's text content, show it
-            if result["text"]:
-                with st.chat_message("assistant"):
-                    st.markdown(result["text"])
             
             # If there are new tool uses, process them in the next update
             if result["tool_uses"]:
@@ -728,7 +750,7 @@ with st.sidebar.expander("Bedrock Tool Configuration", expanded=False):
 # Debug conversation state
 with st.sidebar.expander("Conversation State (Debug)", expanded=False):
     st.write(f"Current state: {st.session_state.conversation_manager.state.value}")
-    st.write(f"Pending tools: {len(st.session_state.conversation_manager.pending_tool_uses)}")
+    st.write(f"Pending tools: {st.session_state.conversation_manager.pending_tool_count()}")
     st.write(f"Messages: {len(st.session_state.conversation_manager.messages)}")
     st.write(f"Error count: {len(st.session_state.conversation_manager.error_counts)}")
     st.write(f"Current tool: {st.session_state.conversation_manager.current_tool_use_id}")
@@ -872,7 +894,7 @@ elif mode == "Agentic Bedrock Chat":
                 
         elif current_state == ConversationState.PROCESSING_TOOLS:
             # Show tool processing status
-            st.info(f"Processing tools... ({len(st.session_state.conversation_manager.pending_tool_uses)} remaining)")
+            st.info(f"Processing tools... ({st.session_state.conversation_manager.pending_tool_count()} remaining)")
             
             if st.sidebar.button("🔄 Force Continue (if stuck)"):
                 st.session_state.conversation_manager.force_continue()
@@ -935,13 +957,14 @@ elif mode == "Agentic Bedrock Chat":
                         st.session_state.conversation_manager.transition_to(ConversationState.WAITING_FOR_RESPONSE)
                         
                         # Log the API call
-                        logger.info(f"Calling Bedrock converse with model={model_id} and {len(messages)} messages")
+                        logger.info(f"Calling Bedrock converse_stream with model={model_id} and {len(messages)} messages")
                         for i, msg in enumerate(messages[-3:] if len(messages) > 3 else messages):
                             logger.info(f"Message {len(messages)-3+i}: role={msg.get('role')}, content_count={len(msg.get('content', []))}")
                         
                         # Make API call
                         start_time = time.time()
-                        response = bedrock_runtime.converse(
+                        result = stream_bedrock_response(
+                            st.session_state.conversation_manager,
                             modelId=model_id,
                             messages=messages,
                             system=system_prompt,
@@ -954,17 +977,7 @@ elif mode == "Agentic Bedrock Chat":
                         duration = time.time() - start_time
                         
                         # Log response
-                        logger.info(f"Bedrock API call completed in {duration:.2f} seconds with status {response.get('stopReason', 'unknown')}")
-                        logger.info(f"Bedrock response: {json.dumps(response, default=str)[:500]}...")
-                        
-                        # Process the response
-                        result = st.session_state.conversation_manager.process_bedrock_response(response)
-                        logger.info(f"Processed Bedrock response: {json.dumps(result, default=str)[:500]}...")
-                        
-                        # If there's text content, show it
-                        if result["text"]:
-                            with st.chat_message("assistant"):
-                                st.markdown(result["text"])
+                        logger.info(f"Bedrock API call completed in {duration:.2f} seconds with status {result['stop_reason']}")
                         
                         # If there are tool uses, trigger a rerun to start processing
                         if result["tool_uses"]:
@@ -2,15 +2,41 @@
 Manages the conversation context for Bedrock conversations with tool usage.
 Implements a state machine for more predictable conversation flow.
 """
-from typing import Dict, Any, List, Set, Optional
+from typing import Dict, Any, List, Set, Optional, Tuple, Awaitable
+import asyncio
 import logging
 import json
+import orjson
 import time
+import hashlib
+from collections import OrderedDict, deque
+from itertools import islice
 from enum import Enum
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+def _dumps(obj: Any) -> str:
+    """Serialize an object to JSON for log output"""
+    return orjson.dumps(obj, default=str).decode()
+
+# Log previews keep at most this many characters per string and items per container
+PREVIEW_CHARS = 100
+PREVIEW_ITEMS = 10
+
+def _shorten(obj: Any) -> Any:
+    """Copy of obj cut down to preview size, without visiting the rest"""
+    if isinstance(obj, str):
+        return obj if len(obj) <= PREVIEW_CHARS else obj[:PREVIEW_CHARS] + "..."
+    if isinstance(obj, dict):
+        return {k: _shorten(v) for k, v in islice(obj.items(), PREVIEW_ITEMS)}
+    if isinstance(obj, (list, tuple)):
+        return [_shorten(v) for v in obj[:PREVIEW_ITEMS]]
+    return obj
+
+def _preview(obj: Any) -> str:
+    """Short JSON preview of a possibly large object for log lines"""
+    text = _dumps(_shorten(obj))
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "..."
+
+# Logging is configured by the application (see app.py)
 logger = logging.getLogger(__name__)
 
 class ConversationState(Enum):
@@ -21,31 +47,141 @@ class ConversationState(Enum):
     CONTINUING = "continuing"                 # Continuing conversation after tools
     ERROR = "error"                           # Error state
 
+# Upper bound on per-tool bookkeeping kept for a single conversation
+MAX_TRACKED_TOOL_USES = 1024
+
+class _LRUDict(OrderedDict):
+    """OrderedDict that evicts its least recently written entry past maxsize."""
+    
+    def __init__(self, maxsize: int = MAX_TRACKED_TOOL_USES, can_evict=None):
+        self.maxsize = maxsize
+        self.can_evict = can_evict  # Optional predicate(value); False pins an entry
+        super().__init__()
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self._evict(key)
+    
+    def _evict(self, written_key) -> None:
+        """Drop the oldest evictable entries, other than the one just written, until within maxsize"""
+        if self.can_evict is None:
+            self.popitem(last=False)
+            return
+        excess = len(self) - self.maxsize
+        victims = []
+        for key, value in self.items():
+            if key != written_key and self.can_evict(value):
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self[key]
+        # Pinned entries may leave it over maxsize rather than lose live state
+
+# Longest fallback summary kept when compacting history without a summary_fn
+SUMMARY_MAX_CHARS = 2000
+
+# Per-message classification bits, kept in ConversationManager._msg_kind
+_KIND_TEXT = 1
+_KIND_TOOL_USE = 2
+_KIND_TOOL_RESULT = 4
+_KIND_CACHE_POINT = 8
+
+# Per-tool status bits, kept in ConversationManager._tool_state
+_TOOL_PENDING = 1
+_TOOL_RESULTED = 2
+
+def _tool_settled(entry: Dict[str, Any]) -> bool:
+    """Whether a _tool_state entry may be evicted: pending tools must stay counted"""
+    return not entry["flags"] & _TOOL_PENDING
+
+def _is_cache_point(content_item: Any) -> bool:
+    """Check whether a content block is a Bedrock cachePoint marker"""
+    return type(content_item) is dict and "cachePoint" in content_item
+
+def _canon(message: Dict[str, Any]) -> str:
+    """Canonical JSON form of a message, stable across key order and cachePoints"""
+    content = message.get("content")
+    if type(content) is list and any(_is_cache_point(item) for item in content):
+        message = {**message, "content": [item for item in content if not _is_cache_point(item)]}
+    return json.dumps(message, sort_keys=True, separators=(",", ":"), default=str)
+
+def _chain_fingerprint(prev_fp: str, message: Dict[str, Any]) -> str:
+    """Extend a conversation fingerprint with one more message"""
+    return hashlib.sha256((prev_fp + _canon(message)).encode("utf-8")).hexdigest()
+
 class ConversationManager:
     """
     Manages the conversation context for Bedrock conversations with tool usage.
     Implements a state machine for more predictable processing flow.
     """
     
+    # Fixed attribute layout: no per-instance __dict__, faster attribute access
+    __slots__ = (
+        "messages", "_tool_state", "_sequence_dirty",
+        "_prefix_fp", "_prefix_fp_count", "_prefix_fp_version",
+        "max_messages", "summary_fn", "prompt_caching", "_last_cache_anchor_idx",
+        "_msg_kind", "_tool_use_idx", "_tool_result_idx", "_assistant_last_idx",
+        "_role_counts", "_tool_result_count",
+        "_version", "_last_validated_version", "_snapshot", "_snapshot_version",
+        "_last_validation_errors",
+        "state", "_pending_count", "_pending_queue", "current_tool_use_id",
+        "max_retries", "error_counts", "last_error",
+        "state_transition_time", "_timeout_handlers", "_stream_state",
+    )
+    
     def __init__(self):
         """Initialize the conversation manager with empty state"""
         # Conversation content
         self.messages = []                         # All conversation messages
-        self.tool_calls = {}                       # Map of tool_use_id to tool call details
+        self._tool_state = _LRUDict(can_evict=_tool_settled)  # Map of tool_use_id to {"call": tool use, "flags": _TOOL_* bits}
+        self._sequence_dirty = False               # Messages may need validation before sending
+        self._prefix_fp = ""                       # Fingerprint of the first _prefix_fp_count messages
+        self._prefix_fp_count = 0                  # Messages folded into _prefix_fp
+        self._prefix_fp_version = -1               # Version _prefix_fp was brought up to date at
+        self.max_messages = None                   # History length that triggers compaction, None disables it
+        self.summary_fn = None                     # Optional callable(messages) -> summary text
+        self.prompt_caching = False                # Mark a cachePoint for models that support it
+        self._last_cache_anchor_idx = -1           # Message holding our cachePoint, -1 if none
+        
+        # Indexes into messages, maintained as messages are appended
+        self._msg_kind = []                        # _KIND_* bits per message, aligned with messages
+        self._tool_use_idx = {}                    # Map of tool_use_id to index of its toolUse message
+        self._tool_result_idx = {}                 # Map of tool_use_id to index of its toolResult message
+        self._assistant_last_idx = -1              # Index of the latest assistant message
+        self._role_counts = {"user": 0, "assistant": 0}  # Number of messages per role
+        self._tool_result_count = 0                # Number of messages carrying toolResults
+        self._version = 0                          # Incremented on every change to the history
+        self._last_validated_version = -1          # Version checked by the last validate_message_flow
+        self._snapshot = ()                        # Messages as last returned by get_bedrock_messages
+        self._snapshot_version = -1                # Version the snapshot was taken at
+        self._last_validation_errors = []          # Problems found by the last validate_message_flow
         
         # State tracking
         self.state = ConversationState.IDLE        # Current state
-        self.pending_tool_uses = set()             # Set of tool_use_ids that need results
-        self.used_tool_results = set()             # Track which tool results have been used
+        self._pending_count = 0                    # Number of tool uses that need results
+        self._pending_queue = deque()              # FIFO order of pending tool_use_ids
         self.current_tool_use_id = None            # Currently processing tool ID
         
         # Error handling
         self.max_retries = 3                       # Maximum number of retries for failed tool calls
-        self.error_counts = {}                     # Track errors per tool to avoid infinite loops
+        self.error_counts = _LRUDict()             # Track errors per tool to avoid infinite loops
         self.last_error = None                     # Last error message
         
         # Performance monitoring
-        self.state_transition_time = None          # Time of last state transition
+        self.state_transition_time = None          # Monotonic time of last state transition
+        
+        # Timeout recovery action per state, built once
+        self._timeout_handlers = {
+            ConversationState.PROCESSING_TOOLS: self.force_continue,
+            ConversationState.WAITING_FOR_RESPONSE: self._timeout_to_error,
+            ConversationState.CONTINUING: self._timeout_to_idle,
+        }
+        
+        # Partially received streamed response
+        self._reset_stream_state()
         
         logger.info("ConversationManager initialized in IDLE state")
     
@@ -58,19 +194,26 @@ class ConversationManager:
         """
         old_state = self.state
         self.state = new_state
-        self.state_transition_time = time.time()
+        self.state_transition_time = time.monotonic()
         
-        logger.info(f"State transition: {old_state.value} -> {new_state.value}")
+        logger.info("State transition: %s -> %s", old_state.value, new_state.value)
         
         # Perform state entry actions
         if new_state == ConversationState.IDLE:
             # Clear processing state but maintain conversation
-            self.pending_tool_uses.clear()
+            for tool_use_id in self._pending_queue:
+                entry = self._tool_state.get(tool_use_id)
+                if entry is not None:
+                    entry["flags"] &= ~_TOOL_PENDING
+            self._pending_count = 0
+            self._version += 1
+            self._pending_queue.clear()
             self.current_tool_use_id = None
             self.last_error = None
         
         # Log the current conversation state for debugging
-        logger.info(f"Conversation state: {len(self.messages)} messages, {len(self.pending_tool_uses)} pending tools")
+        logger.info("Conversation state: %d messages, %d pending tools",
+                    len(self.messages), self._pending_count)
     
     def add_user_message(self, content: str) -> Optional[Dict[str, Any]]:
         """
@@ -84,21 +227,17 @@ class ConversationManager:
         """
         # Only add new user messages in IDLE state
         if self.state != ConversationState.IDLE:
-            logger.warning(f"Cannot add user message in {self.state.value} state")
+            logger.warning("Cannot add user message in %s state", self.state.value)
             return None
             
-        message = {
-            "role": "user",
-            "content": [
-                {
-                    "text": content
-                }
-            ]
-        }
+        message = {"role": "user", "content": [{"text": content}]}
         
-        self.messages.append(message)
-        logger.info(f"Added user message of {len(content)} chars")
-        logger.debug(f"User message content: {content[:100]}...")
+        self._append_message(message)
+        self._maybe_compact()
+        logger.info("Added user message of %d chars", len(content))
+        # Skip building the preview slice unless it will be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("User message content: %s...", content[:100])
         return message
     
     def add_assistant_message(self, content: str) -> Dict[str, Any]:
@@ -111,18 +250,14 @@ class ConversationManager:
         Returns:
             The created message object
         """
-        message = {
-            "role": "assistant",
-            "content": [
-                {
-                    "text": content
-                }
-            ]
-        }
+        message = {"role": "assistant", "content": [{"text": content}]}
         
-        self.messages.append(message)
-        logger.info(f"Added assistant message of {len(content)} chars")
-        logger.debug(f"Assistant message content: {content[:100]}...")
+        self._append_message(message)
+        self._maybe_compact()
+        logger.info("Added assistant message of %d chars", len(content))
+        # Skip building the preview slice unless it will be logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Assistant message content: %s...", content[:100])
         return message
     
     def process_bedrock_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
@@ -136,62 +271,184 @@ class ConversationManager:
             A dict containing extracted data including any tool uses
         """
         stop_reason = response.get("stopReason", "unknown")
-        logger.info(f"Processing Bedrock response with stop reason: {stop_reason}")
+        logger.info("Processing Bedrock response with stop reason: %s", stop_reason)
         
+        # Get output message
+        if "output" in response and "message" in response["output"]:
+            message = response["output"]["message"]
+            logger.info("Found output message with content length: %d", len(message.get('content', [])))
+            result = self._commit_assistant_content(message.get("content", []), stop_reason)
+        else:
+            result = {
+                "text": "",
+                "tool_uses": [],
+                "stop_reason": stop_reason
+            }
+        
+        # Log the overall status
+        logger.info("Processed Bedrock response. Text: %d chars, Tool uses: %d, "
+                    "Current pending tool uses: %d",
+                    len(result['text']), len(result['tool_uses']), self._pending_count)
+        
+        return result
+    
+    def process_bedrock_stream_event(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Process one event from a Bedrock converse_stream response.
+        
+        Text and toolUse input deltas are assembled per contentBlockIndex.
+        The assistant message is committed on messageStop with the same
+        bookkeeping as process_bedrock_response.
+        
+        Args:
+            event: One event from the response's "stream"
+            
+        Returns:
+            The extracted data (as from process_bedrock_response) on
+            messageStop, None for every other event
+        """
+        stream = self._stream_state
+        
+        if "contentBlockDelta" in event:
+            block_delta = event["contentBlockDelta"]
+            block_idx = block_delta.get("contentBlockIndex", 0)
+            delta = block_delta.get("delta", {})
+            if "text" in delta:
+                # Text blocks have no contentBlockStart; open one on first delta
+                block = stream.get(block_idx)
+                if block is None:
+                    block = stream[block_idx] = {"text": []}
+                block["text"].append(delta["text"])
+            elif "toolUse" in delta:
+                block = stream.get(block_idx)
+                if block is None or "toolUse" not in block:
+                    logger.warning("toolUse delta for unknown content block %d - ignoring", block_idx)
+                else:
+                    block["input"].append(delta["toolUse"].get("input", ""))
+        elif "contentBlockStart" in event:
+            block_start = event["contentBlockStart"]
+            start = block_start.get("start", {})
+            if "toolUse" in start:
+                tool_use = start["toolUse"]
+                stream[block_start.get("contentBlockIndex", 0)] = {
+                    "toolUse": {
+                        "toolUseId": tool_use.get("toolUseId"),
+                        "name": tool_use.get("name")
+                    },
+                    "input": []
+                }
+        elif "messageStart" in event:
+            self._reset_stream_state()
+        elif "messageStop" in event:
+            # Blocks are committed in index order, however their deltas interleaved
+            content_blocks = [self._finish_stream_block(stream[block_idx]) for block_idx in sorted(stream)]
+            self._reset_stream_state()
+            
+            stop_reason = event["messageStop"].get("stopReason", "unknown")
+            logger.info("Processing streamed Bedrock response with stop reason: %s", stop_reason)
+            result = self._commit_assistant_content(content_blocks, stop_reason)
+            
+            logger.info("Processed streamed Bedrock response. Text: %d chars, Tool uses: %d",
+                        len(result['text']), len(result['tool_uses']))
+            return result
+        
+        return None
+    
+    def _reset_stream_state(self) -> None:
+        """Start assembling a new streamed assistant message"""
+        # contentBlockIndex -> {"text": [deltas]} or {"toolUse": {...}, "input": [JSON fragments]}
+        self._stream_state = {}
+    
+    @staticmethod
+    def _finish_stream_block(block: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Turn a streamed partial block into a Converse content block.
+        
+        Args:
+            block: The partial block assembled from deltas
+            
+        Returns:
+            The completed text or toolUse content block
+        """
+        if "toolUse" not in block:
+            return {"text": "".join(block["text"])}
+        
+        tool_use = block["toolUse"]
+        raw_input = "".join(block["input"])
+        try:
+            tool_use["input"] = json.loads(raw_input) if raw_input else {}
+        except json.JSONDecodeError as e:
+            logger.error("Invalid toolUse input for %s: %s", tool_use.get('toolUseId'), e)
+            tool_use["input"] = {}
+        return {"toolUse": tool_use}
+    
+    def _commit_assistant_content(self, content_blocks: List[Dict[str, Any]], stop_reason: str) -> Dict[str, Any]:
+        """
+        Record a complete assistant message and track its tool uses.
+        
+        Args:
+            content_blocks: The assistant message content
+            stop_reason: The Bedrock stop reason
+            
+        Returns:
+            A dict containing extracted data including any tool uses
+        """
         result = {
             "text": "",
             "tool_uses": [],
             "stop_reason": stop_reason
         }
+        content_blocks = self._validate_content(content_blocks)
         
-        # Get output message
-        if "output" in response and "message" in response["output"]:
-            message = response["output"]["message"]
-            logger.info(f"Found output message with content length: {len(message.get('content', []))}")
-            
-            content_blocks = message.get("content", [])
-            tool_use_blocks = []
-            text_blocks = []
-            
-            # First pass - separate text and toolUse blocks
-            for content in content_blocks:
-                if "text" in content:
-                    result["text"] += content["text"]
-                    text_blocks.append(content)
-                    logger.debug(f"Found text content: {content['text'][:50]}...")
-                elif "toolUse" in content:
-                    tool_use = content["toolUse"]
-                    tool_use_id = tool_use.get("toolUseId")
-                    
-                    logger.info(f"Found toolUse with ID: {tool_use_id}, name: {tool_use.get('name')}")
-                    
-                    # Track this tool use
-                    self.tool_calls[tool_use_id] = tool_use
-                    self.pending_tool_uses.add(tool_use_id)
-                    tool_use_blocks.append(content)
-                    result["tool_uses"].append(tool_use)
-                    
-                    # Initialize error count for this tool
-                    self.error_counts[tool_use_id] = 0
-            
-            # Add the message with all content (text and toolUse blocks)
-            if content_blocks:
-                self.messages.append({
-                    "role": "assistant",
-                    "content": content_blocks
-                })
-            
-            # If we have any tool uses, transition to PROCESSING_TOOLS state
-            if tool_use_blocks:
-                self.transition_to(ConversationState.PROCESSING_TOOLS)
-            else:
-                # If no tool uses, go back to IDLE state
-                self.transition_to(ConversationState.IDLE)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response content blocks: %s", _dumps(content_blocks))
+        # Single pass over the blocks; locals avoid repeated attribute loads
+        text_parts = []
+        tool_uses = result["tool_uses"]
+        tool_state = self._tool_state
+        pending_queue = self._pending_queue
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         
-        # Log the overall status
-        logger.info(f"Processed Bedrock response. Text: {len(result['text'])} chars, "
-                    f"Tool uses: {len(result['tool_uses'])}, "
-                    f"Current pending tool uses: {len(self.pending_tool_uses)}")
+        for content in content_blocks:
+            if "text" in content:
+                text_parts.append(content["text"])
+                if debug_enabled:
+                    logger.debug("Found text content: %s...", content["text"][:50])
+            elif "toolUse" in content:
+                tool_use = content["toolUse"]
+                tool_use_id = tool_use.get("toolUseId")
+                
+                logger.info("Found toolUse with ID: %s, name: %s", tool_use_id, tool_use.get('name'))
+                
+                # Track this tool use; a repeated id keeps its result status
+                entry = tool_state.get(tool_use_id)
+                if entry is None:
+                    tool_state[tool_use_id] = {"call": tool_use, "flags": _TOOL_PENDING}
+                    self._pending_count += 1
+                else:
+                    entry["call"] = tool_use
+                    if not entry["flags"] & _TOOL_PENDING:
+                        entry["flags"] |= _TOOL_PENDING
+                        self._pending_count += 1
+                pending_queue.append(tool_use_id)
+                tool_uses.append(tool_use)
+        
+        result["text"] = "".join(text_parts)
+        
+        # Add the message with all content (text and toolUse blocks)
+        if content_blocks:
+            self._append_message({
+                "role": "assistant",
+                "content": content_blocks
+            })
+        
+        # If we have any tool uses, transition to PROCESSING_TOOLS state
+        if tool_uses:
+            self.transition_to(ConversationState.PROCESSING_TOOLS)
+        else:
+            # If no tool uses, go back to IDLE state
+            self.transition_to(ConversationState.IDLE)
+            self._maybe_compact()
         
         return result
     
@@ -206,59 +463,67 @@ class ConversationManager:
         Returns:
             The created tool result message or None if invalid
         """
-        logger.info(f"Adding tool result for {tool_use_id}")
+        logger.info("Adding tool result for %s", tool_use_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Tool result for %s: %s", tool_use_id, _preview(result))
+        
+        entry = self._tool_state.get(tool_use_id)
+        
+        # Check if we've already added a result for this tool; the index
+        # outlives LRU eviction of the state entry, so late duplicates are caught too
+        if (entry is not None and entry["flags"] & _TOOL_RESULTED) or tool_use_id in self._tool_result_idx:
+            logger.warning("Tool result for %s has already been added - skipping", tool_use_id)
+            return None
         
         # Validate tool_use_id exists in pending tools
-        if tool_use_id not in self.pending_tool_uses:
-            logger.warning(f"Adding result for unknown or already processed tool use ID: {tool_use_id}")
+        if entry is None or not entry["flags"] & _TOOL_PENDING:
+            logger.warning("Adding result for unknown or already processed tool use ID: %s", tool_use_id)
             
             # Verify that the toolUse exists in the message history
-            tool_exists_in_history = False
-            for msg in self.messages:
-                if msg.get("role") == "assistant":
-                    for content_item in msg.get("content", []):
-                        if isinstance(content_item, dict) and "toolUse" in content_item:
-                            if content_item["toolUse"].get("toolUseId") == tool_use_id:
-                                tool_exists_in_history = True
-                                # If exists in history but not in pending, re-add it
-                                self.pending_tool_uses.add(tool_use_id)
-                                self.tool_calls[tool_use_id] = content_item["toolUse"]
-                                break
-            
-            if not tool_exists_in_history:
-                logger.error(f"Cannot add tool result for {tool_use_id} - not found in conversation history")
+            tool_use = None
+            msg_idx = self._tool_use_idx.get(tool_use_id)
+            if msg_idx is not None:
+                for content_item in self.messages[msg_idx].get("content", []):
+                    if type(content_item) is dict:
+                        candidate = content_item.get("toolUse")
+                        if candidate is not None and candidate.get("toolUseId") == tool_use_id:
+                            tool_use = candidate
+                            break
+            
+            if tool_use is None:
+                logger.error("Cannot add tool result for %s - not found in conversation history", tool_use_id)
                 return None
-        
-        # Check if we've already added a result for this tool
-        if tool_use_id in self.used_tool_results:
-            logger.warning(f"Tool result for {tool_use_id} has already been added - skipping")
-            return None
+            
+            # If exists in history but not in pending, re-add it
+            if entry is None:
+                entry = {"call": tool_use, "flags": _TOOL_PENDING}
+                self._tool_state[tool_use_id] = entry
+            else:
+                entry["call"] = tool_use
+                entry["flags"] |= _TOOL_PENDING
+            self._pending_count += 1
+            self._pending_queue.append(tool_use_id)
+            # A late result can land out of sequence
+            self._sequence_dirty = True
         
         # Check if the result indicates an error
         is_error = False
         if "error" in result:
             is_error = True
-            logger.warning(f"Tool result contains error: {result.get('error')}")
+            logger.warning("Tool result contains error: %s", result.get('error'))
             
             # Increment error count for this tool
             self.error_counts[tool_use_id] = self.error_counts.get(tool_use_id, 0) + 1
             
             # If we've exceeded max retries, add error result and continue
             if self.error_counts[tool_use_id] > self.max_retries:
-                logger.error(f"Exceeded maximum retries ({self.max_retries}) for tool {tool_use_id}")
+                logger.error("Exceeded maximum retries (%d) for tool %s", self.max_retries, tool_use_id)
                 # Continue with error result
             else:
-                # We'll keep the tool in pending_tool_uses for retry
-                logger.info(f"Will retry tool {tool_use_id} (attempt {self.error_counts[tool_use_id]})")
+                # We'll keep the tool pending for retry
+                logger.info("Will retry tool %s (attempt %d)", tool_use_id, self.error_counts[tool_use_id])
                 return None
             
-        # Format content for the tool result
-        content_value = result.get("content", "")
-        if isinstance(content_value, str):
-            result_content = {"text": content_value}
-        else:
-            result_content = {"json": content_value}
-        
         # Create the toolResult message
         tool_result_message = {
             "role": "user",
@@ -266,73 +531,389 @@ class ConversationManager:
                 {
                     "toolResult": {
                         "toolUseId": tool_use_id,
-                        "content": [result_content]
+                        "content": [self._format_tool_result_content(result)]
                     }
                 }
             ]
         }
         
         # Add to conversation and remove from pending
-        self.messages.append(tool_result_message)
+        self._append_message(tool_result_message)
         
-        # Track that we've used this tool result
-        self.used_tool_results.add(tool_use_id)
-        
-        if tool_use_id in self.pending_tool_uses:
-            self.pending_tool_uses.remove(tool_use_id)
-            logger.info(f"Removed {tool_use_id} from pending tool uses. Remaining: {len(self.pending_tool_uses)}")
+        # Track that we've used this tool result; it is no longer pending
+        entry["flags"] = (entry["flags"] & ~_TOOL_PENDING) | _TOOL_RESULTED
+        self._pending_count -= 1
+        # Retries are over for this tool
+        self.error_counts.pop(tool_use_id, None)
+        # Results usually arrive in order, so the head is the common case;
+        # anything else is skipped lazily by get_next_pending_tool_id
+        if self._pending_queue and self._pending_queue[0] == tool_use_id:
+            self._pending_queue.popleft()
+        logger.info("Removed %s from pending tool uses. Remaining: %d", tool_use_id, self._pending_count)
         
         # Clear the current tool use ID
         if self.current_tool_use_id == tool_use_id:
             self.current_tool_use_id = None
         
         # If we've processed all pending tool uses, transition to CONTINUING state
-        if not self.pending_tool_uses and self.state == ConversationState.PROCESSING_TOOLS:
+        if not self._pending_count and self.state == ConversationState.PROCESSING_TOOLS:
             logger.info("All tool uses processed, transitioning to CONTINUING state")
             self.transition_to(ConversationState.CONTINUING)
             
         return tool_result_message
     
-    def get_bedrock_messages(self) -> List[Dict[str, Any]]:
+    def add_tool_results(self, results: List[Tuple[str, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Add results for several parallel tool uses as a single user message.
+        
+        Ids that are not pending, or already have a result, are skipped.
+        Error results follow the same retry policy as add_tool_result.
+        
+        Args:
+            results: List of (tool_use_id, result) pairs
+        
+        Returns:
+            The created tool result message or None if no result was added
+        """
+        accepted = []
+        seen = set()
+        for tool_use_id, result in results:
+            entry = self._tool_state.get(tool_use_id)
+            if entry is None or not entry["flags"] & _TOOL_PENDING or tool_use_id in seen:
+                logger.warning("Skipping result for unknown or already processed tool use ID: %s", tool_use_id)
+                continue
+            if entry["flags"] & _TOOL_RESULTED:
+                logger.warning("Tool result for %s has already been added - skipping", tool_use_id)
+                continue
+            
+            if "error" in result:
+                logger.warning("Tool result contains error: %s", result.get('error'))
+                self.error_counts[tool_use_id] = self.error_counts.get(tool_use_id, 0) + 1
+                if self.error_counts[tool_use_id] <= self.max_retries:
+                    # Keep the tool pending for retry
+                    logger.info("Will retry tool %s (attempt %d)", tool_use_id, self.error_counts[tool_use_id])
+                    continue
+                logger.error("Exceeded maximum retries (%d) for tool %s", self.max_retries, tool_use_id)
+            
+            seen.add(tool_use_id)
+            accepted.append((tool_use_id, result))
+        
+        tool_result_message = self._append_batched_tool_results(accepted)
+        
+        # If we've processed all pending tool uses, transition to CONTINUING state
+        if tool_result_message is not None and not self._pending_count \
+                and self.state == ConversationState.PROCESSING_TOOLS:
+            logger.info("All tool uses processed, transitioning to CONTINUING state")
+            self.transition_to(ConversationState.CONTINUING)
+        
+        return tool_result_message
+    
+    async def add_tool_results_gathered(self, tool_coros: Dict[str, Awaitable[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Run several tool calls concurrently and add their results together.
+        
+        The calls are awaited with asyncio.gather, so the tool phase takes as
+        long as the slowest tool rather than the sum of all of them. Results
+        are added in the order of tool_coros as a single message.
+        
+        Args:
+            tool_coros: Map of tool_use_id to an awaitable producing its result
+            
+        Returns:
+            The created tool result message or None if no result was added
+        """
+        outcomes = await asyncio.gather(*tool_coros.values(), return_exceptions=True)
+        
+        results = []
+        for tool_use_id, outcome in zip(tool_coros, outcomes):
+            # BaseException also covers a cancelled call (asyncio.CancelledError)
+            if isinstance(outcome, BaseException):
+                logger.error("Error executing tool %s: %r", tool_use_id, outcome)
+                # Report the failure to the model so the conversation can continue;
+                # an "error" key would instead keep the tool pending for a retry
+                outcome = {"content": f"Error executing tool: {outcome!r}"}
+            elif not isinstance(outcome, dict):
+                outcome = {"content": outcome}
+            results.append((tool_use_id, outcome))
+        
+        return self.add_tool_results(results)
+    
+    def _append_message(self, message: Dict[str, Any]) -> int:
+        """
+        Append a message and keep the per-message indexes aligned with it.
+        
+        Args:
+            message: The message to append
+            
+        Returns:
+            The index of the appended message
+        """
+        msg_idx = len(self.messages)
+        kind = self._index_message(msg_idx, message["content"])
+        self.messages.append(message)
+        self._msg_kind.append(kind)
+        role = message["role"]
+        self._role_counts[role] += 1
+        if role == "assistant":
+            self._assistant_last_idx = msg_idx
+        if kind & _KIND_TOOL_RESULT:
+            self._tool_result_count += 1
+        self._version += 1
+        return msg_idx
+    
+    def _index_message(self, msg_idx: int, content: List[Dict[str, Any]]) -> int:
+        """
+        Classify a message's content blocks and index its tool ids.
+        
+        This is the one place content blocks are walked for indexing; every
+        other lookup goes through _msg_kind and the tool_use_id maps.
+        
+        Args:
+            msg_idx: The position of the message in the history
+            content: The message content, a list of content-block dicts
+            
+        Returns:
+            The _KIND_* bits describing its content
+        """
+        kind = 0
+        for content_item in content:
+            if "text" in content_item:
+                kind |= _KIND_TEXT
+                continue
+            if "cachePoint" in content_item:
+                kind |= _KIND_CACHE_POINT
+                continue
+            tool_use = content_item.get("toolUse")
+            if tool_use is not None:
+                kind |= _KIND_TOOL_USE
+                self._tool_use_idx[tool_use.get("toolUseId")] = msg_idx
+                continue
+            tool_result = content_item.get("toolResult")
+            if tool_result is not None:
+                kind |= _KIND_TOOL_RESULT
+                self._tool_result_idx[tool_result.get("toolUseId")] = msg_idx
+        return kind
+    
+    @staticmethod
+    def _validate_content(content: Any) -> List[Dict[str, Any]]:
+        """
+        Normalize content to a list of content-block dicts.
+        
+        Content built by this class is already in this form; content from
+        outside is checked here once so indexing can skip per-block checks.
+        
+        Args:
+            content: The content to normalize
+            
+        Returns:
+            The content as a list holding only dict blocks
+        """
+        if not isinstance(content, list):
+            logger.error("Content is not a list, wrapping it as text")
+            return [{"text": str(content)}]
+        if all(type(content_item) is dict for content_item in content):
+            return content
+        logger.error("Dropping non-dict content blocks")
+        return [content_item for content_item in content if type(content_item) is dict]
+    
+    @staticmethod
+    def _format_tool_result_content(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Format a tool result as a Bedrock toolResult content block"""
+        content_value = result.get("content", "")
+        if isinstance(content_value, str):
+            return {"text": content_value}
+        return {"json": content_value}
+    
+    def _append_batched_tool_results(self, results: List[Tuple[str, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Append results for several pending tools as a single user message.
+        
+        Bedrock expects the results for one assistant turn grouped in one user
+        message. Callers must only pass pending tool_use_ids; none of the
+        per-tool checks done by add_tool_result are repeated here.
+        
+        Args:
+            results: List of (tool_use_id, result) pairs
+            
+        Returns:
+            The created tool result message or None if there was nothing to add
+        """
+        if not results:
+            return None
+        
+        tool_result_message = {
+            "role": "user",
+            "content": [
+                {
+                    "toolResult": {
+                        "toolUseId": tool_use_id,
+                        "content": [self._format_tool_result_content(result)]
+                    }
+                }
+                for tool_use_id, result in results
+            ]
+        }
+        self._append_message(tool_result_message)
+        
+        resolved = [tool_use_id for tool_use_id, _ in results]
+        tool_state = self._tool_state
+        for tool_use_id in resolved:
+            self.error_counts.pop(tool_use_id, None)
+            entry = tool_state.get(tool_use_id)
+            if entry is not None:
+                if entry["flags"] & _TOOL_PENDING:
+                    self._pending_count -= 1
+                entry["flags"] = (entry["flags"] & ~_TOOL_PENDING) | _TOOL_RESULTED
+        if not self._pending_count:
+            self._pending_queue.clear()
+        if self.current_tool_use_id in resolved:
+            self.current_tool_use_id = None
+        
+        logger.info("Added %d tool results in one message. Remaining: %d", len(resolved), self._pending_count)
+        return tool_result_message
+    
+    def get_bedrock_messages(self) -> Tuple[Dict[str, Any], ...]:
         """
         Get the messages in Bedrock format.
         
         Returns:
-            List of messages in the format expected by Bedrock
+            Tuple of messages in the format expected by Bedrock, reused
+            until the conversation changes
         """
-        # Debug message counts
-        assistant_count = sum(1 for m in self.messages if m.get('role') == 'assistant')
-        user_count = sum(1 for m in self.messages if m.get('role') == 'user')
-        tool_result_count = sum(
-            1 for m in self.messages 
-            if m.get('role') == 'user' and any('toolResult' in c for c in m.get('content', []))
-        )
+        # Unchanged since the last call: the history is already prepared.
+        # A checkpoint is placed exactly when prompt caching is on.
+        if (self._snapshot_version == self._version and not self._sequence_dirty
+                and len(self._msg_kind) == len(self.messages)
+                and (self._last_cache_anchor_idx >= 0) == self.prompt_caching):
+            return self._snapshot
         
-        logger.info(f"Getting Bedrock messages: {len(self.messages)} total "
-                   f"({assistant_count} assistant, {user_count} user, {tool_result_count} toolResult)")
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         
-        # Validate the structure for debugging
-        has_errors = False
-        for i, msg in enumerate(self.messages):
-            if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
-                logger.error(f"Invalid message at index {i}: {msg}")
-                has_errors = True
+        # Messages appended from outside the class are not indexed yet
+        if len(self._msg_kind) != len(self.messages):
+            self._sequence_dirty = True
+            self._rebuild_indexes()
+        
+        # Debug message counts, maintained as messages are appended
+        if debug_enabled:
+            logger.debug("Getting Bedrock messages: %d total (%d assistant, %d user, %d toolResult)",
+                         len(self.messages), self._role_counts["assistant"], self._role_counts["user"],
+                         self._tool_result_count)
+        
+        # Messages built by this class are well-formed, so only validate
+        # when something may have broken the structure
+        if self._sequence_dirty:
+            has_errors = False
+            for i, msg in enumerate(self.messages):
+                if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
+                    logger.error("Invalid message at index %d: %s", i, msg)
+                    has_errors = True
+            
+            if debug_enabled:
+                for tool_use_id, msg_idx in self._tool_result_idx.items():
+                    logger.debug("Message %d contains toolResult for ID: %s", msg_idx, tool_use_id)
             
-            if msg.get('role') == 'user' and any('toolResult' in c for c in msg.get('content', [])):
-                for content in msg.get('content', []):
-                    if 'toolResult' in content:
-                        tool_use_id = content['toolResult'].get('toolUseId')
-                        logger.debug(f"Message {i} contains toolResult for ID: {tool_use_id}")
+            for error in self.validate_message_flow():
+                logger.warning(error)
+            
+            # Bedrock rejects a toolResult without a preceding toolUse
+            if has_errors or self._orphan_tool_results():
+                logger.warning("Messages contain errors - see logs above")
+                # Auto-repair if issues found
+                self._repair_message_sequence()
+            
+            self._sequence_dirty = False
+        
+        if self.prompt_caching:
+            # Keep one checkpoint after the latest settled assistant turn
+            self.insert_cache_checkpoint()
+        else:
+            # Clean up any cache points from messages, visiting only those
+            # indexed as carrying one
+            msg_kind = self._msg_kind
+            for i, kind in enumerate(msg_kind):
+                if kind & _KIND_CACHE_POINT:
+                    self.remove_cache_checkpoint([self.messages[i]])
+                    msg_kind[i] = kind & ~_KIND_CACHE_POINT
+            self._last_cache_anchor_idx = -1
+        
+        # Shared by every caller until the history changes again
+        self._snapshot = tuple(self.messages)
+        self._snapshot_version = self._version
+        return self._snapshot
+    
+    def validate_message_flow(self) -> List[str]:
+        """
+        Check that every toolResult follows its toolUse and that every
+        toolUse that is no longer pending has a result.
+        
+        Works from the tool_use_id indexes rather than the history, and the
+        outcome is cached until the conversation changes.
+        
+        Returns:
+            List of problems found, empty if the flow is valid
+        """
+        if self._last_validated_version == self._version:
+            return self._last_validation_errors
+        
+        errors = [
+            f"toolResult for {tool_use_id} at message {msg_idx} has no preceding toolUse"
+            for tool_use_id, msg_idx in self._orphan_tool_results()
+        ]
+        tool_result_idx = self._tool_result_idx
+        for tool_use_id, msg_idx in self._tool_use_idx.items():
+            if tool_use_id not in tool_result_idx and not self._is_pending(tool_use_id):
+                errors.append(f"toolUse {tool_use_id} at message {msg_idx} has no toolResult")
+        
+        self._last_validation_errors = errors
+        self._last_validated_version = self._version
+        return errors
+    
+    def _orphan_tool_results(self) -> List[Tuple[str, int]]:
+        """
+        Find toolResults whose toolUse is missing or comes later.
         
-        if has_errors:
-            logger.warning("Messages contain errors - see logs above")
-            # Auto-repair if issues found
-            self._repair_message_sequence()
+        Returns:
+            List of (tool_use_id, message index) pairs
+        """
+        tool_use_idx = self._tool_use_idx
+        orphans = []
+        for tool_use_id, msg_idx in self._tool_result_idx.items():
+            use_idx = tool_use_idx.get(tool_use_id)
+            if use_idx is None or use_idx >= msg_idx:
+                orphans.append((tool_use_id, msg_idx))
+        return orphans
+    
+    def get_version(self) -> int:
+        """
+        Get the history version, which changes whenever the messages do.
+        
+        Returns:
+            A counter callers can key caches of derived data on
+        """
+        return self._version
+    
+    def current_fingerprint(self) -> str:
+        """
+        Get the fingerprint of the conversation so far.
         
-        # Clean up any cache points from messages
-        self.messages = self.remove_cache_checkpoint(self.messages)
+        The fingerprint is chained message by message, so two managers with
+        the same history have the same fingerprint. It is computed on demand:
+        appends cost nothing, and a call only hashes messages added since the
+        previous one.
         
-        return self.messages
+        Returns:
+            Hex SHA-256 fingerprint, or an empty string for an empty conversation
+        """
+        if self._prefix_fp_version != self._version:
+            fingerprint = self._prefix_fp
+            for msg in islice(self.messages, self._prefix_fp_count, None):
+                if type(msg) is dict:
+                    fingerprint = _chain_fingerprint(fingerprint, msg)
+            self._prefix_fp = fingerprint
+            self._prefix_fp_count = len(self.messages)
+            self._prefix_fp_version = self._version
+        return self._prefix_fp
     
     def get_tool_use(self, tool_use_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -344,9 +925,10 @@ class ConversationManager:
         Returns:
             The tool use details or None if not found
         """
-        tool_use = self.tool_calls.get(tool_use_id)
+        entry = self._tool_state.get(tool_use_id)
+        tool_use = entry["call"] if entry is not None else None
         if not tool_use:
-            logger.warning(f"Tool use not found for ID: {tool_use_id}")
+            logger.warning("Tool use not found for ID: %s", tool_use_id)
         return tool_use
     
     def get_next_pending_tool_id(self) -> Optional[str]:
@@ -356,14 +938,25 @@ class ConversationManager:
         Returns:
             The next tool use ID or None if no pending tools
         """
-        if not self.pending_tool_uses:
+        if not self._pending_count:
             logger.debug("No pending tool uses to process")
             return None
         
-        # Get the next tool from the pending set
-        tool_use_id = next(iter(self.pending_tool_uses))
+        # Drop queue entries that were resolved since they were queued
+        queue = self._pending_queue
+        while queue and not self._is_pending(queue[0]):
+            queue.popleft()
+        if not queue:
+            # The count drifted from the queue; resync so callers can move on
+            logger.warning("Pending count was %d but no pending tool uses remain", self._pending_count)
+            self._pending_count = 0
+            return None
+        
+        # Take the oldest pending tool without removing it; it stays queued
+        # until add_tool_result resolves it
+        tool_use_id = queue[0]
         self.current_tool_use_id = tool_use_id
-        logger.info(f"Selected next pending tool: {tool_use_id}")
+        logger.info("Selected next pending tool: %s", tool_use_id)
         return tool_use_id
     
     def has_pending_tool_uses(self) -> bool:
@@ -373,7 +966,21 @@ class ConversationManager:
         Returns:
             True if there are pending tool uses, False otherwise
         """
-        return len(self.pending_tool_uses) > 0
+        return self._pending_count > 0
+    
+    def pending_tool_count(self) -> int:
+        """
+        Get the number of tool uses still waiting for a result.
+        
+        Returns:
+            The number of pending tool uses
+        """
+        return self._pending_count
+    
+    def _is_pending(self, tool_use_id: str) -> bool:
+        """Check whether a tool use still needs a result"""
+        entry = self._tool_state.get(tool_use_id)
+        return entry is not None and bool(entry["flags"] & _TOOL_PENDING)
     
     def is_processing_tools(self) -> bool:
         """
@@ -421,16 +1028,16 @@ class ConversationManager:
         # For each message, ensure it has a role and content
         for i, msg in enumerate(self.messages):
             if not isinstance(msg, dict):
-                logger.error(f"Invalid message at index {i}, removing")
+                logger.error("Invalid message at index %d, removing", i)
                 self.messages[i] = None
                 continue
                 
             if 'role' not in msg:
-                logger.error(f"Message at index {i} has no role, adding default")
+                logger.error("Message at index %d has no role, adding default", i)
                 msg['role'] = 'user'
                 
             if 'content' not in msg or not isinstance(msg['content'], list):
-                logger.error(f"Message at index {i} has invalid content, fixing")
+                logger.error("Message at index %d has invalid content, fixing", i)
                 # If no content, add empty content
                 if 'content' not in msg:
                     msg['content'] = []
@@ -438,25 +1045,83 @@ class ConversationManager:
                 elif not isinstance(msg['content'], list):
                     msg['content'] = [{"text": str(msg['content'])}]
                     
-        # Remove None messages
-        self.messages = [msg for msg in self.messages if msg is not None]
+        # Drop toolResults that do not answer an earlier toolUse; the
+        # indexes still match the history here
+        for tool_use_id, msg_idx in self._orphan_tool_results():
+            msg = self.messages[msg_idx]
+            if msg is None:
+                continue
+            logger.error("Dropping toolResult for %s at index %d: no preceding toolUse", tool_use_id, msg_idx)
+            msg['content'] = [
+                item for item in msg['content']
+                if not (type(item) is dict and "toolResult" in item
+                        and item["toolResult"].get("toolUseId") == tool_use_id)
+            ]
+            if not msg['content']:
+                self.messages[msg_idx] = None
         
-        # Ensure we don't have user->user or assistant->assistant sequences
-        i = 1
-        while i < len(self.messages):
-            prev_role = self.messages[i-1].get('role')
-            curr_role = self.messages[i].get('role')
-            
-            if prev_role == curr_role:
-                logger.warning(f"Found {prev_role}->{curr_role} sequence at index {i}, merging")
+        # Remove None messages and merge user->user or assistant->assistant
+        # sequences in one pass, without shifting the list for each merge
+        repaired = []
+        for msg in self.messages:
+            if msg is None:
+                continue
+            if repaired and repaired[-1].get('role') == msg.get('role'):
+                role = msg.get('role')
+                logger.warning("Found %s->%s sequence at index %d, merging", role, role, len(repaired))
                 # Merge content from current message into previous
-                self.messages[i-1]['content'].extend(self.messages[i].get('content', []))
-                # Remove current message
-                self.messages.pop(i)
+                repaired[-1]['content'].extend(msg.get('content', []))
             else:
-                i += 1
+                repaired.append(msg)
+        self.messages = repaired
+        
+        # Messages were removed or merged, so every stored index is stale
+        self._rebuild_indexes()
                 
-        logger.info(f"Repair complete, now have {len(self.messages)} messages")
+        logger.info("Repair complete, now have %d messages", len(self.messages))
+    
+    def _rebuild_indexes(self) -> None:
+        """Rebuild the per-message indexes from the full history"""
+        # Positions may have shifted; the checkpoint is placed again on the next send
+        if self._last_cache_anchor_idx >= 0:
+            self.remove_cache_checkpoint([msg for msg in self.messages if type(msg) is dict])
+            self._last_cache_anchor_idx = -1
+        
+        msg_kind = self._msg_kind
+        msg_kind.clear()
+        self._tool_use_idx.clear()
+        self._tool_result_idx.clear()
+        self._assistant_last_idx = -1
+        role_counts = {"user": 0, "assistant": 0}
+        tool_result_count = 0
+        
+        for i, msg in enumerate(self.messages):
+            if type(msg) is not dict:
+                msg_kind.append(0)
+                continue
+            role = msg.get("role")
+            if role in role_counts:
+                role_counts[role] += 1
+            if role == "assistant":
+                self._assistant_last_idx = i
+            
+            content = msg.get("content")
+            if type(content) is not list:
+                content = []
+            elif not all(type(content_item) is dict for content_item in content):
+                # Malformed blocks are left for _repair_message_sequence
+                content = [content_item for content_item in content if type(content_item) is dict]
+            kind = self._index_message(i, content)
+            if kind & _KIND_TOOL_RESULT:
+                tool_result_count += 1
+            msg_kind.append(kind)
+        
+        # Earlier messages may have changed; rehash from the start on next use
+        self._prefix_fp = ""
+        self._prefix_fp_count = 0
+        self._role_counts = role_counts
+        self._tool_result_count = tool_result_count
+        self._version += 1
     
     def remove_cache_checkpoint(self, messages: list) -> list:
         """
@@ -469,27 +1134,145 @@ class ConversationManager:
             list: The modified messages list with cachePoint blocks removed but toolUse preserved.
         """
         for message in messages:
-            if "content" in message and isinstance(message["content"], list):
-                # First, identify any toolUse blocks that need to be preserved
-                tool_use_blocks = [item for item in message["content"] 
-                                  if isinstance(item, dict) and "toolUse" in item]
-                
-                # Remove cachePoint blocks but preserve everything else
-                message["content"] = [item for item in message["content"] 
-                                     if isinstance(item, dict) and "cachePoint" not in item]
-                
-                # If any toolUse blocks were removed (which shouldn't happen), log and add them back
-                current_tool_use_blocks = [item for item in message["content"] 
-                                          if isinstance(item, dict) and "toolUse" in item]
-                missing_tool_blocks = [block for block in tool_use_blocks 
-                                      if block not in current_tool_use_blocks]
-                
-                if missing_tool_blocks:
-                    logger.warning(f"Found {len(missing_tool_blocks)} toolUse blocks that were incorrectly removed - restoring them")
-                    message["content"].extend(missing_tool_blocks)
+            content = message.get("content")
+            if not isinstance(content, list):
+                continue
+            
+            # Cheap probe first - most messages have nothing to remove.
+            # The filter only drops cachePoint blocks, so toolUse blocks
+            # always survive it.
+            if not any(_is_cache_point(item) for item in content):
+                continue
+            
+            message["content"] = [item for item in content if not _is_cache_point(item)]
         
         return messages
     
+    def insert_cache_checkpoint(self, cache_type: str = "default") -> int:
+        """
+        Mark the conversation prefix for Bedrock prompt caching.
+        
+        Places a cachePoint block at the end of the latest assistant message
+        whose tool uses are all resolved. The checkpoint is only moved when
+        that message changes, so repeated sends reuse the cached prefix.
+        
+        Args:
+            cache_type: The cachePoint type
+            
+        Returns:
+            Index of the message holding the checkpoint, -1 if none
+        """
+        anchor = self._assistant_last_idx
+        if self._pending_count:
+            # The latest assistant turn is still waiting for tool results
+            anchor = self._last_cache_anchor_idx
+        
+        old_anchor = self._last_cache_anchor_idx
+        if anchor == old_anchor:
+            return anchor
+        
+        msg_kind = self._msg_kind
+        if 0 <= old_anchor < len(self.messages):
+            self.remove_cache_checkpoint([self.messages[old_anchor]])
+            msg_kind[old_anchor] &= ~_KIND_CACHE_POINT
+        if anchor >= 0:
+            if not msg_kind[anchor] & _KIND_CACHE_POINT:
+                self.messages[anchor]["content"].append({"cachePoint": {"type": cache_type}})
+                msg_kind[anchor] |= _KIND_CACHE_POINT
+        
+        self._last_cache_anchor_idx = anchor
+        self._version += 1
+        logger.debug("Cache checkpoint moved from message %d to %d", old_anchor, anchor)
+        return anchor
+    
+    def compact(self, keep_last_n: int = 20) -> int:
+        """
+        Replace older history with a single summary message.
+        
+        The kept tail starts at an assistant message, so every kept toolResult
+        still follows its toolUse and the summary (a user message) keeps roles
+        alternating. The latest assistant message, which holds any pending
+        tool uses, is always kept.
+        
+        Args:
+            keep_last_n: Approximate number of recent messages to keep
+        
+        Returns:
+            The number of messages removed
+        """
+        messages = self.messages
+        
+        # First assistant message inside the window, else the latest one
+        cut = -1
+        for i in range(max(len(messages) - keep_last_n, 0), len(messages)):
+            msg = messages[i]
+            if type(msg) is dict and msg.get("role") == "assistant":
+                cut = i
+                break
+        if cut < 0:
+            cut = self._assistant_last_idx
+        
+        # Nothing worth replacing: the summary would not be shorter
+        if cut <= 1:
+            return 0
+        
+        summary = {
+            "role": "user",
+            "content": [{"text": self._summarize(messages[:cut])}]
+        }
+        messages[:cut] = [summary]
+        self._rebuild_indexes()
+        self._trim_tool_state()
+        
+        removed = cut - 1
+        logger.info("Compacted conversation: removed %d messages, %d remain", removed, len(messages))
+        return removed
+    
+    def _trim_tool_state(self) -> None:
+        """Forget tools whose toolUse is no longer in the history and that are not pending"""
+        tool_use_idx = self._tool_use_idx
+        stale = [
+            tool_use_id for tool_use_id, entry in self._tool_state.items()
+            if tool_use_id not in tool_use_idx and not entry["flags"] & _TOOL_PENDING
+        ]
+        for tool_use_id in stale:
+            del self._tool_state[tool_use_id]
+            self.error_counts.pop(tool_use_id, None)
+        if stale:
+            logger.debug("Dropped state for %d compacted tool uses", len(stale))
+    
+    def _maybe_compact(self) -> None:
+        """Compact the history once it outgrows max_messages, between turns only"""
+        # Opt-in: app.py renders the chat history straight from messages
+        if self.max_messages is None or len(self.messages) <= self.max_messages or self._pending_count:
+            return
+        # Keep half the budget so compaction runs once per several turns
+        self.compact(keep_last_n=self.max_messages // 2)
+    
+    def _summarize(self, messages: List[Dict[str, Any]]) -> str:
+        """
+        Render messages about to be dropped as summary text.
+        
+        Args:
+            messages: The messages being replaced
+            
+        Returns:
+            Text from summary_fn, or their text blocks joined and truncated
+        """
+        if self.summary_fn is not None:
+            return self.summary_fn(messages)
+        
+        texts = [
+            content_item["text"]
+            for msg in messages if type(msg) is dict
+            for content_item in msg.get("content", [])
+            if type(content_item) is dict and "text" in content_item
+        ]
+        summary = " ".join(texts)
+        if len(summary) > SUMMARY_MAX_CHARS:
+            summary = summary[:SUMMARY_MAX_CHARS] + "..."
+        return f"[Summary of {len(messages)} earlier messages] {summary}"
+    
     def force_continue(self) -> bool:
         """
         Force conversation to continue by resolving any pending tool uses with error messages.
@@ -498,19 +1281,24 @@ class ConversationManager:
         Returns:
             True if action was taken, False otherwise
         """
-        logger.warning(f"Forcing conversation to continue from state {self.state.value}")
+        logger.warning("Forcing conversation to continue from state %s", self.state.value)
         
         # If in error state or idle, nothing to do
         if self.state == ConversationState.ERROR or self.state == ConversationState.IDLE:
-            logger.info(f"No need to force continue in {self.state.value} state")
+            logger.info("No need to force continue in %s state", self.state.value)
             return False
             
         # Handle pending tool uses with error messages
-        if self.pending_tool_uses:
-            logger.warning(f"Resolving {len(self.pending_tool_uses)} pending tools with error messages")
+        if self._pending_count:
+            logger.warning("Resolving %d pending tools with error messages", self._pending_count)
             
-            # Create error results for all pending tools
-            for tool_use_id in list(self.pending_tool_uses):
+            # Create error results for all pending tools, oldest first
+            error_results = []
+            pending_in_order = dict.fromkeys(
+                tool_use_id for tool_use_id in self._pending_queue
+                if self._is_pending(tool_use_id)
+            )
+            for tool_use_id in pending_in_order:
                 tool_use = self.get_tool_use(tool_use_id)
                 tool_name = tool_use.get("name", "unknown") if tool_use else "unknown"
                 
@@ -518,9 +1306,10 @@ class ConversationManager:
                 error_result = {
                     "content": f"Error: Unable to complete tool {tool_name} due to connectivity issues. Let's continue the conversation."
                 }
-                
-                # Add the error result
-                self.add_tool_result(tool_use_id, error_result)
+                error_results.append((tool_use_id, error_result))
+            
+            # Add all error results in a single message
+            self._append_batched_tool_results(error_results)
         
         # Transition to CONTINUING state to ensure we get a final response
         self.transition_to(ConversationState.CONTINUING)
@@ -528,14 +1317,29 @@ class ConversationManager:
     
     def reset(self) -> None:
         """Reset the conversation state completely"""
-        self.messages = []
-        self.tool_calls = {}
-        self.pending_tool_uses = set()
-        self.used_tool_results = set()
+        # Clear in place so the existing containers are reused
+        self.messages.clear()
+        self._tool_state.clear()
+        self._pending_count = 0
+        self._pending_queue.clear()
         self.current_tool_use_id = None
-        self.error_counts = {}
+        self.error_counts.clear()
+        self._msg_kind.clear()
+        self._tool_use_idx.clear()
+        self._tool_result_idx.clear()
+        self._assistant_last_idx = -1
+        self._role_counts = {"user": 0, "assistant": 0}
+        self._tool_result_count = 0
+        self._last_cache_anchor_idx = -1
+        self._snapshot = ()
+        self._version += 1
+        self._last_validation_errors = []
+        self._prefix_fp = ""
+        self._prefix_fp_count = 0
+        self._reset_stream_state()
         self.last_error = None
         self.state = ConversationState.IDLE
+        self._sequence_dirty = False
         logger.info("Conversation manager reset to initial state")
     
     def get_state_duration(self) -> float:
@@ -545,10 +1349,10 @@ class ConversationManager:
         Returns:
             Duration in seconds or 0 if no transition time
         """
-        if not self.state_transition_time:
+        if self.state_transition_time is None:
             return 0
             
-        return time.time() - self.state_transition_time
+        return time.monotonic() - self.state_transition_time
     
     def handle_timeout(self, max_duration: float = 60.0) -> bool:
         """
@@ -560,22 +1364,24 @@ class ConversationManager:
         Returns:
             True if a timeout was handled, False otherwise
         """
-        if self.get_state_duration() > max_duration:
-            logger.warning(f"Timeout detected in state {self.state.value} after {self.get_state_duration():.1f} seconds")
-            
-            if self.state == ConversationState.PROCESSING_TOOLS:
-                # Force continue from a stuck processing state
-                return self.force_continue()
-                
-            elif self.state == ConversationState.WAITING_FOR_RESPONSE:
-                # Timeout waiting for response, go to error state
-                self.last_error = "Timed out waiting for Bedrock response"
-                self.transition_to(ConversationState.ERROR)
-                return True
-                
-            elif self.state == ConversationState.CONTINUING:
-                # Timeout in continuing state, go back to idle
-                self.transition_to(ConversationState.IDLE)
-                return True
-                
-        return False
\ No newline at end of file
+        duration = self.get_state_duration()
+        if duration <= max_duration:
+            return False
+        
+        handler = self._timeout_handlers.get(self.state)
+        if handler is None:
+            return False
+        
+        logger.warning("Timeout detected in state %s after %.1f seconds", self.state.value, duration)
+        return handler()
+    
+    def _timeout_to_error(self) -> bool:
+        """Timeout waiting for response, go to error state"""
+        self.last_error = "Timed out waiting for Bedrock response"
+        self.transition_to(ConversationState.ERROR)
+        return True
+    
+    def _timeout_to_idle(self) -> bool:
+        """Timeout in continuing state, go back to idle"""
+        self.transition_to(ConversationState.IDLE)
+        return True
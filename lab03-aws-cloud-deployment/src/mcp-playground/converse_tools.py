@@ -1,14 +1,61 @@
 from typing import Dict, Any, List
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InsecureRequestWarning
+from urllib3.util.retry import Retry
+import orjson
+import ssl
+import warnings
+
+# One TLS context shared by every discovery connection (development only: no
+# certificate checks, so self-signed MCP servers work; no CA bundle is loaded)
+_SSL_CONTEXT = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+_SSL_CONTEXT.check_hostname = False
+_SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+
+class _SSLContextAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools reuse the shared SSLContext"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = _SSL_CONTEXT
+        return super().init_poolmanager(*args, **kwargs)
 
 class ConverseToolManager:
     def __init__(self):
         self._mcp_servers = {}
         self._name_mapping = {}  # Maps Bedrock names to MCP names
+        self._mcp_to_bedrock = {}  # Maps (server, MCP name) to Bedrock name
+        self._dispatch = {}  # Maps Bedrock names to (server_url, MCP name)
+        self._tool_config_cache = None  # Last get_tool_config result
+        
+        # Pooled session so repeated discovery reuses TCP/TLS connections
+        self._http = requests.Session()
+        adapter = _SSLContextAdapter(pool_connections=10, pool_maxsize=50,
+                                     max_retries=Retry(total=2, backoff_factor=0.2))
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        self._http.headers.update({
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        })
+        self._http.verify = False  # For development only
+    
+    def close(self):
+        """Close pooled HTTP connections"""
+        self._http.close()
     
     def register_server(self, server_name: str, server_url: str, tools: List[Dict]):
         """Register an MCP server and its tools"""
+        self._tool_config_cache = None
+        
+        # Drop names from a previous registration of this server
+        for mcp_name in self._mcp_servers.get(server_name, {}).get('tools', {}):
+            bedrock_name = self._mcp_to_bedrock.pop((server_name, mcp_name), None)
+            # Names are not server-prefixed, so another server may own it now
+            if self._name_mapping.get(bedrock_name, {}).get('server') == server_name:
+                del self._name_mapping[bedrock_name]
+                del self._dispatch[bedrock_name]
+        
         self._mcp_servers[server_name] = {
             'url': server_url,
             'tools': {}
@@ -19,17 +66,22 @@ class ConverseToolManager:
             mcp_name = tool.get('name')  # Original hyphenated name (e.g., 'get-product')
             bedrock_name = mcp_name.replace('-', '_')  # Sanitized name (e.g., 'get_product')
             
-            # Store the mapping
+            # Store the mapping in both directions
             self._name_mapping[bedrock_name] = {
                 'server': server_name,
                 'method': mcp_name
             }
+            self._mcp_to_bedrock[(server_name, mcp_name)] = bedrock_name
+            self._dispatch[bedrock_name] = (server_url, mcp_name)
             
             # Store the tool details
             self._mcp_servers[server_name]['tools'][mcp_name] = tool
     
     def get_tool_config(self) -> Dict:
         """Generate Bedrock tool configuration with sanitized names"""
+        if self._tool_config_cache is not None:
+            return self._tool_config_cache
+        
         tool_specs = []
         
         # Create tool specs for each registered tool
@@ -60,19 +112,18 @@ class ConverseToolManager:
             
             tool_specs.append(tool_spec)
         
-        return {"tools": tool_specs}
+        self._tool_config_cache = {"tools": tool_specs}
+        return self._tool_config_cache
     
     def translate_tool_call(self, tool_name: str, tool_input: Dict) -> Dict:
         """Translate a Bedrock tool call to an MCP request"""
-        if tool_name not in self._name_mapping:
+        try:
+            server_url, method_name = self._dispatch[tool_name]
+        except KeyError:
             raise ValueError(f"Unknown tool: {tool_name}")
         
-        mapping = self._name_mapping[tool_name]
-        server_name = mapping['server']
-        method_name = mapping['method']
-        
         return {
-            'server_url': self._mcp_servers[server_name]['url'],
+            'server_url': server_url,
             'method': method_name,
             'params': tool_input
         }
@@ -93,19 +144,14 @@ class ConverseToolManager:
             }
             
             # Send the request to the MCP server
-            response = requests.post(
-                server_url,
-                json=list_request,
-                headers={
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
-                verify=False  # For development only
-            )
+            # Only this unverified request is silenced, not the whole process
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', InsecureRequestWarning)
+                response = self._http.post(server_url, data=orjson.dumps(list_request), timeout=(3, 10))
             
             # Parse the response
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 if "result" in result and "tools" in result["result"]:
                     tools = result["result"]["tools"]
                     self.register_server(server_name, server_url, tools)
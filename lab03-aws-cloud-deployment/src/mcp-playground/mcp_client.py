@@ -1,13 +1,27 @@
-from mcp.client.streamable_http import streamablehttp_client
-from mcp import ClientSession
-from mcp.types import Tool, TextContent, Resource, Prompt
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, TYPE_CHECKING
 import logging
 import asyncio
+import io
 
-logging.basicConfig(level=logging.INFO)
+if TYPE_CHECKING:
+    from mcp.types import Tool, Resource, Prompt
+
+# Logging is configured by the application (see app.py)
 logger = logging.getLogger(__name__)
 
+# The MCP SDK (and its httpx/anyio dependencies) is imported on first use
+_lazy: Dict[str, Any] = {}
+
+def _mcp() -> Dict[str, Any]:
+    """Import the MCP SDK names this module uses, once"""
+    if not _lazy:
+        from mcp.client.streamable_http import streamablehttp_client
+        from mcp import ClientSession
+        from mcp.types import TextContent, Resource, Prompt
+        _lazy.update(streamablehttp_client=streamablehttp_client, ClientSession=ClientSession,
+                     TextContent=TextContent, Resource=Resource, Prompt=Prompt)
+    return _lazy
+
 class ConnectionError(Exception):
     """Raised when connection to the server fails."""
     pass
@@ -36,16 +50,16 @@ class McpClient:
     async def init(self):
         try:
             async with asyncio.timeout(self.timeout):
-                logger.info(f"Connecting to {self.url}")
-                logger.info(f"Using headers: {self.headers}")
-                self.stream_context = streamablehttp_client(
+                logger.info("Connecting to %s", self.url)
+                mcp = _mcp()
+                self.stream_context = mcp['streamablehttp_client'](
                     self.url,
                     headers=self.headers
                 )
                 self.read_stream, self.write_stream, _ = await self.stream_context.__aenter__()
 
                 logger.info("Initializing session")
-                self.session = ClientSession(self.read_stream, self.write_stream)
+                self.session = mcp['ClientSession'](self.read_stream, self.write_stream)
                 await self.session.__aenter__()
                 await self.session.initialize()
 
@@ -53,11 +67,11 @@ class McpClient:
                 return self
 
         except asyncio.TimeoutError:
-            logger.error(f"Connection timed out after {self.timeout} seconds")
+            logger.error("Connection timed out after %s seconds", self.timeout)
             await self.cleanup()
             raise ConnectionError(f"Connection timed out after {self.timeout} seconds")
         except Exception as e:
-            logger.error(f"Initialization error: {e}")
+            logger.error("Initialization error: %s", e)
             await self.cleanup()
             raise
 
@@ -68,99 +82,252 @@ class McpClient:
             if self.stream_context:
                 await self.stream_context.__aexit__(None, None, None)
         except Exception as e:
-            logger.error(f"Error during cleanup: {e}")
+            logger.error("Error during cleanup: %s", e)
 
-    async def get_tools(self) -> List[Tool]:
+    async def get_tools(self) -> List["Tool"]:
         try:
             async with asyncio.timeout(self.timeout):
                 response = await self.session.list_tools()
                 return response.tools
         except asyncio.TimeoutError:
-            logger.error(f"Get tools operation timed out after {self.timeout} seconds")
+            logger.error("Get tools operation timed out after %s seconds", self.timeout)
             raise
         except Exception as e:
-            logger.error(f"Error getting tools list: {e}")
+            logger.error("Error getting tools list: %s", e)
             raise
 
     async def call_tool(self, tool_name: str, params: Dict[str, Any]) -> str:
         try:
             async with asyncio.timeout(self.timeout):
-                logger.info(f"Calling tool: {tool_name} with params: {params}")
+                logger.info("Calling tool: %s with params: %s", tool_name, params)
                 result = await self.session.call_tool(tool_name, params)
-                logger.info(f"Raw tool call result: {result}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw tool call result: %r", result)
 
                 if hasattr(result, 'content') and result.content:
+                    TextContent = _mcp()['TextContent']
                     for content in result.content:
                         if isinstance(content, TextContent):
                             return content.text
                 return str(result)
         except asyncio.TimeoutError:
-            logger.error(f"Tool call operation timed out after {self.timeout} seconds")
+            logger.error("Tool call operation timed out after %s seconds", self.timeout)
             # Return a friendly error instead of raising exception
             return f"Operation timed out after {self.timeout} seconds"
         except Exception as e:
-            logger.error(f"Error calling tool {tool_name}: {e}")
+            logger.error("Error calling tool %s: %s", tool_name, e)
             # Return a friendly error instead of raising exception
             return f"Error calling tool {tool_name}: {str(e)}"
 
-    async def get_resources(self) -> List[Resource]:
+    async def get_resources(self) -> List["Resource"]:
         try:
             async with asyncio.timeout(self.timeout):
                 response = await self.session.list_resources()
-                logger.info(f"Raw resources response: {response}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw resources response: %r", response)
                 if isinstance(response, list):
+                    Resource = _mcp()['Resource']
                     return [Resource(**r) if isinstance(r, dict) else r for r in response]
                 elif hasattr(response, 'resources'):
                     return response.resources
                 else:
                     raise ValueError("Unexpected response format for resources")
         except asyncio.TimeoutError:
-            logger.error(f"Get resources operation timed out after {self.timeout} seconds")
+            logger.error("Get resources operation timed out after %s seconds", self.timeout)
             raise
         except Exception as e:
-            logger.error(f"Error getting resources list: {e}")
+            logger.error("Error getting resources list: %s", e)
             raise
 
-    async def get_resource(self, resource_id: str) -> Optional[Resource]:
+    async def get_resource(self, resource_id: str) -> Optional["Resource"]:
         try:
             async with asyncio.timeout(self.timeout):
                 resource = await self.session.read_resource(resource_id)
-                logger.info(f"Raw resource response: {resource}")
-                return Resource(**resource) if isinstance(resource, dict) else resource
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw resource response: %r", resource)
+                return _mcp()['Resource'](**resource) if isinstance(resource, dict) else resource
         except asyncio.TimeoutError:
-            logger.error(f"Get resource operation timed out after {self.timeout} seconds")
+            logger.error("Get resource operation timed out after %s seconds", self.timeout)
             raise
         except Exception as e:
-            logger.error(f"Error getting resource {resource_id}: {e}")
+            logger.error("Error getting resource %s: %s", resource_id, e)
             raise
 
-    async def get_prompts(self) -> List[Prompt]:
+    async def get_prompts(self) -> List["Prompt"]:
         try:
             async with asyncio.timeout(self.timeout):
                 response = await self.session.list_prompts()
-                logger.info(f"Raw prompts response: {response}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw prompts response: %r", response)
                 if isinstance(response, list):
+                    Prompt = _mcp()['Prompt']
                     return [Prompt(**p) if isinstance(p, dict) else p for p in response]
                 elif hasattr(response, 'prompts'):
                     return response.prompts
                 else:
                     raise ValueError("Unexpected response format for prompts")
         except asyncio.TimeoutError:
-            logger.error(f"Get prompts operation timed out after {self.timeout} seconds")
+            logger.error("Get prompts operation timed out after %s seconds", self.timeout)
             raise
         except Exception as e:
-            logger.error(f"Error getting prompts list: {e}")
+            logger.error("Error getting prompts list: %s", e)
             raise
 
-    async def get_prompt(self, prompt_id: str) -> Optional[Prompt]:
+    async def get_prompt(self, prompt_id: str) -> Optional["Prompt"]:
         try:
             async with asyncio.timeout(self.timeout):
                 prompt = await self.session.get_prompt(prompt_id)
-                logger.info(f"Raw prompt response: {prompt}")
-                return Prompt(**prompt) if isinstance(prompt, dict) else prompt
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw prompt response: %r", prompt)
+                return _mcp()['Prompt'](**prompt) if isinstance(prompt, dict) else prompt
         except asyncio.TimeoutError:
-            logger.error(f"Get prompt operation timed out after {self.timeout} seconds")
+            logger.error("Get prompt operation timed out after %s seconds", self.timeout)
             raise
         except Exception as e:
-            logger.error(f"Error getting prompt {prompt_id}: {e}")
-            raise
\ No newline at end of file
+            logger.error("Error getting prompt %s: %s", prompt_id, e)
+            raise
+
+class MCPClient(McpClient):
+    """
+    Long-lived client used by MCPServerManager.
+    
+    Connects once and reuses the session, so repeated tool calls do not pay
+    for a new streamable HTTP handshake and MCP initialize each time.
+    """
+    
+    def __init__(self, url: str, auth_token: str = None, timeout: float = 10.0):
+        super().__init__(url, auth_token, timeout)
+        self._connected = False                # True once init() has succeeded
+        self._connect_lock = asyncio.Lock()    # Serializes concurrent connect() callers
+    
+    async def connect(self) -> bool:
+        """
+        Connect to the server unless already connected.
+        
+        Returns:
+            True if the session is ready, False otherwise
+        """
+        async with self._connect_lock:
+            if self._connected:
+                return True
+            try:
+                await self.init()
+            except asyncio.CancelledError:
+                # Cancelled mid-handshake (e.g. by the discovery timeout); init()
+                # only exits what it entered on ordinary errors
+                await self._close_streams()
+                raise
+            except Exception as e:
+                logger.error("Failed to connect to %s: %s", self.url, e)
+                # init() already exited its contexts; don't let a later cleanup repeat it
+                self.session = None
+                self.stream_context = None
+                return False
+            self._connected = True
+            return True
+    
+    async def list_tools(self) -> List["Tool"]:
+        """
+        List the server's tools.
+        
+        Returns:
+            List of tools
+        """
+        session = self.session
+        try:
+            return await self.get_tools()
+        except Exception:
+            await self._drop_session(session)
+            raise
+    
+    async def call_tool_stream(self, tool_name: str, params: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Call a tool and yield its text content block by block.
+        
+        Args:
+            tool_name: The MCP tool name
+            params: Tool parameters
+            
+        Yields:
+            The text of each text content block, or the result's string form
+            if it has none
+            
+        Raises:
+            asyncio.TimeoutError: If the call exceeds the client timeout
+        """
+        session = self.session
+        try:
+            result = await asyncio.wait_for(session.call_tool(tool_name, params), self.timeout)
+        except Exception:
+            await self._drop_session(session)
+            raise
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw tool call result: %r", result)
+        
+        TextContent = _mcp()['TextContent']
+        has_text = False
+        for content in result.content or []:
+            if isinstance(content, TextContent):
+                has_text = True
+                yield content.text
+        if not has_text:
+            yield str(result)
+    
+    async def call_tool(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Call a tool, bounded by the client timeout.
+        
+        Args:
+            tool_name: The MCP tool name
+            params: Tool parameters
+            
+        Returns:
+            {"content": text} on success or {"error": message} on failure,
+            ready for ConversationManager.add_tool_result
+        """
+        # Write blocks straight into one buffer rather than a list to join
+        buf = io.StringIO()
+        first = True
+        try:
+            # Same output as "\n".join(blocks), empty leading blocks included
+            async for text in self.call_tool_stream(tool_name, params):
+                if not first:
+                    buf.write("\n")
+                buf.write(text)
+                first = False
+        except asyncio.TimeoutError:
+            logger.error("Tool call %s timed out after %s seconds", tool_name, self.timeout)
+            return {"error": f"Tool {tool_name} timed out after {self.timeout} seconds"}
+        except Exception as e:
+            logger.error("Error calling tool %s: %s", tool_name, e)
+            return {"error": f"Error calling tool {tool_name}: {str(e)}"}
+        return {"content": buf.getvalue()}
+    
+    async def disconnect(self):
+        """Close the session; the next connect() re-initializes."""
+        await self._drop_session(self.session)
+    
+    async def _drop_session(self, session: Any):
+        """
+        Close a session that failed so the next connect() opens a fresh one.
+        
+        Args:
+            session: The session the failing call used; nothing is done if a
+                concurrent caller has already replaced it
+        """
+        async with self._connect_lock:
+            if self.session is not session:
+                return
+            await self._close_streams()
+            self._connected = False
+    
+    async def _close_streams(self):
+        """Exit the session and stream contexts, bounded by the timeout, and forget them"""
+        try:
+            # A dead connection must not wedge every later connect()
+            async with asyncio.timeout(self.timeout):
+                await self.cleanup()
+        except asyncio.TimeoutError:
+            logger.error("Closing session to %s timed out after %s seconds", self.url, self.timeout)
+        self.session = None
+        self.stream_context = None
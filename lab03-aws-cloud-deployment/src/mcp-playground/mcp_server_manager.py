@@ -3,11 +3,19 @@ MCP Server Manager - Handles registration, discovery, and management of MCP serv
 using the standard MCP protocol.
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 import uuid
 import asyncio
+import concurrent.futures
+import dataclasses
+import hashlib
 import json
+import orjson
+import os
+import threading
+import time
+from pathlib import Path
 from mcp_client import MCPClient
 
 logger = logging.getLogger(__name__)
@@ -18,20 +26,90 @@ class MCPServerManager:
     and routing of tool calls to appropriate servers.
     """
     
-    def __init__(self):
-        """Initialize the server manager with empty state"""
+    CATALOG_TTL = 3600  # Seconds a cached tool catalog stays fresh
+    DISCOVERY_BACKOFF = 60  # Seconds before lazily retrying a failed discovery
+    
+    def __init__(self, discovery_timeout: float = 10.0, call_timeout: float = 30.0,
+                 discovery_concurrency: int = 16):
+        """
+        Initialize the server manager with empty state.
+        
+        Args:
+            discovery_timeout: Seconds allowed to connect to and list one server
+            call_timeout: Seconds allowed for a single tool call
+            discovery_concurrency: Maximum servers discovered at once
+        """
+        self.discovery_timeout = discovery_timeout
+        self.call_timeout = call_timeout
+        self.discovery_concurrency = discovery_concurrency
         self.servers = {}  # Map of server_name to server details
         self.tool_mapping = {}  # Map of bedrock_name to server and tool details
+        self._server_bedrock_names = {}  # Map of server_name to its bedrock_names
+        self._dispatch = {}  # Map of bedrock_name to (server_name, client, method)
         self.clients = {}  # Map of server_name to MCPClient instances
-        self.event_loop = None
+        self._cache_path = Path("~/.cache/mcp-playground/tool_catalog.json").expanduser()
+        self._discovered = set()  # Server names whose tools are registered
+        self._discovery_failed_at = {}  # Map of server_name to last failed attempt
+        self._discovery_lock = asyncio.Lock()
+        self._tool_config_cache = None  # Last get_bedrock_tool_config result
+        
+        # All async work runs on one loop driven by a background thread
+        self._closed = False  # Set by close_all; the loop no longer accepts work
+        self._inflight = set()  # Futures _run is waiting on
+        self._inflight_lock = threading.Lock()  # Orders _run submissions against loop shutdown
+        self.event_loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._run_loop,
+                                             name="mcp-server-manager", daemon=True)
+        self._loop_thread.start()
     
-    def _ensure_event_loop(self):
-        """Ensure we have an event loop for async operations"""
+    def _run_loop(self):
+        """Drive the manager's loop until close_all stops it, then close it"""
+        self.event_loop.run_forever()
+        
+        # Let tasks still running unwind before the loop is closed
+        pending = asyncio.all_tasks(self.event_loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.event_loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        
+        # Work submitted too late to run would otherwise be waited on forever
+        with self._inflight_lock:
+            for future in self._inflight:
+                future.cancel()
+            self.event_loop.close()
+    
+    def _run(self, coro) -> Any:
+        """
+        Run a coroutine on the manager's loop and wait for its result.
+        
+        Args:
+            coro: The coroutine to run
+            
+        Returns:
+            The coroutine's result
+        """
+        if self._closed:
+            coro.close()
+            raise RuntimeError("MCPServerManager is closed")
+        
+        # Waiting from the loop's own thread would deadlock it
+        if threading.current_thread() is self._loop_thread:
+            coro.close()
+            raise RuntimeError("Blocking call made from the manager's event loop; "
+                               "await the async variant instead")
+        
+        with self._inflight_lock:
+            if self.event_loop.is_closed():
+                coro.close()
+                raise RuntimeError("MCPServerManager is closed")
+            future = asyncio.run_coroutine_threadsafe(coro, self.event_loop)
+            self._inflight.add(future)
         try:
-            self.event_loop = asyncio.get_event_loop()
-        except RuntimeError:
-            self.event_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.event_loop)
+            return future.result()
+        finally:
+            with self._inflight_lock:
+                self._inflight.discard(future)
     
     def register_server(self, server_name: str, server_url: str, auth_token: Optional[str] = None) -> bool:
         """
@@ -45,17 +123,27 @@ class MCPServerManager:
         Returns:
             True if registration succeeded, False otherwise
         """
+        # Registration only records the server; tools are discovered on first use
+        self._discovered.discard(server_name)
+        self._discovery_failed_at.pop(server_name, None)
+        self._tool_config_cache = None
+        
+        # Dispatch entries point at the old client; rediscovery rebuilds them
+        for bedrock_name in self._server_bedrock_names.get(server_name, ()):
+            self._dispatch.pop(bedrock_name, None)
+        
         # Create server entry
         self.servers[server_name] = {
             'url': server_url,
             'auth_token': auth_token,
             'tools': {},
-            'status': 'registered'
+            'status': 'registered',
+            'cache_key': hashlib.sha256(f"{server_url}|{auth_token or ''}".encode()).hexdigest()
         }
         
         # Create client for this server
         try:
-            client = MCPClient(server_url, auth_token)
+            client = MCPClient(server_url, auth_token, timeout=self.call_timeout)
             self.clients[server_name] = client
             return True
         except Exception as e:
@@ -77,25 +165,46 @@ class MCPServerManager:
             return False
         
         # Remove tool mappings for this server
-        to_remove = []
-        for tool_name, mapping in self.tool_mapping.items():
-            if mapping['server'] == server_name:
-                to_remove.append(tool_name)
-        
-        for tool_name in to_remove:
-            del self.tool_mapping[tool_name]
+        for bedrock_name in self._server_bedrock_names.pop(server_name, ()):
+            self.tool_mapping.pop(bedrock_name, None)
+            self._dispatch.pop(bedrock_name, None)
+        self._tool_config_cache = None
         
         # Close client if it exists
         client = self.clients.pop(server_name, None)
-        if client:
-            self._ensure_event_loop()
+        if client and not self._closed:
             asyncio.run_coroutine_threadsafe(client.disconnect(), self.event_loop)
         
         # Remove server entry
-        del self.servers[server_name]
+        cache_key = self.servers.pop(server_name)['cache_key']
+        self._discovered.discard(server_name)
+        self._discovery_failed_at.pop(server_name, None)
+        
+        # Drop the cached catalog so a re-registration rediscovers. Discovery
+        # rewrites the cache file on the manager loop, so update it there too
+        if self._closed or threading.current_thread() is self._loop_thread:
+            self._forget_catalog(cache_key)
+        else:
+            async def _forget():
+                self._forget_catalog(cache_key)
+            self._run(_forget())
         return True
     
     def discover_tools(self, server_name: str) -> int:
+        """
+        Discover tools from a registered server (blocking).
+        
+        Async callers should await discover_tools_async instead.
+        
+        Args:
+            server_name: The name of the server
+            
+        Returns:
+            Number of tools discovered
+        """
+        return self._run(self.discover_tools_async(server_name))
+    
+    async def discover_tools_async(self, server_name: str) -> int:
         """
         Discover tools from a registered server.
         
@@ -108,58 +217,240 @@ class MCPServerManager:
         if server_name not in self.servers:
             return 0
         
-        client = self.clients.get(server_name)
-        if not client:
+        if not self.clients.get(server_name):
             return 0
         
-        self._ensure_event_loop()
+        counts = await self.discover_all([server_name])
+        return counts.get(server_name, 0)
+    
+    async def discover_all(self, server_names: Optional[List[str]] = None,
+                           concurrency: Optional[int] = None) -> Dict[str, int]:
+        """
+        Discover tools from several servers concurrently.
         
-        try:
-            # Connect to the server
-            connected = asyncio.run_coroutine_threadsafe(
-                client.connect(), self.event_loop).result()
-            
-            if not connected:
-                logger.error(f"Failed to connect to {server_name}")
-                self.servers[server_name]['status'] = 'connection_error'
-                return 0
+        Args:
+            server_names: Servers to discover, all registered servers if None
+            concurrency: Maximum servers discovered at once, defaults to
+                discovery_concurrency
             
-            # List tools from the server
-            tools = asyncio.run_coroutine_threadsafe(
-                client.list_tools(), self.event_loop).result()
+        Returns:
+            Map of server_name to number of tools discovered
+        """
+        names = [name for name in (server_names or list(self.servers))
+                 if name in self.servers and self.clients.get(name)]
+        
+        # Cap open connections; the timeout starts once a server gets a slot
+        sem = asyncio.Semaphore(concurrency or self.discovery_concurrency)
+        
+        async def _bounded(server_name: str) -> int:
+            async with sem:
+                return await asyncio.wait_for(self._discover_one(server_name), self.discovery_timeout)
+        
+        # Servers are independent, so total time is the slowest server
+        results = await asyncio.gather(*(_bounded(name) for name in names), return_exceptions=True)
+        
+        counts = {}
+        for server_name, result in zip(names, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.error(f"Discovery from {server_name} timed out after {self.discovery_timeout} seconds")
+                self.servers[server_name]['status'] = 'timeout'
+                counts[server_name] = 0
+            elif isinstance(result, Exception):
+                logger.error(f"Error discovering tools from {server_name}: {result}")
+                self.servers[server_name]['status'] = 'error'
+                counts[server_name] = 0
+            else:
+                counts[server_name] = result
+        
+        # Remember failures so lazy discovery backs off instead of retrying every call
+        now = time.monotonic()
+        for server_name in names:
+            if server_name not in self._discovered:
+                self._discovery_failed_at[server_name] = now
+        return counts
+    
+    def _pending_discovery(self) -> List[str]:
+        """
+        Get servers that lazy discovery should try now.
+        
+        Returns:
+            Undiscovered server names, minus those still in their failure backoff
+        """
+        if self._discovered.issuperset(self.servers):
+            return []
+        
+        now = time.monotonic()
+        pending = []
+        for name in self.servers:
+            if name in self._discovered:
+                continue
+            failed_at = self._discovery_failed_at.get(name)
+            if failed_at is None or now - failed_at >= self.DISCOVERY_BACKOFF:
+                pending.append(name)
+        return pending
+    
+    async def _ensure_all_discovered(self):
+        """Discover every registered server whose tools are not yet registered"""
+        if not self._pending_discovery():
+            return
+        async with self._discovery_lock:
+            pending = self._pending_discovery()
+            if pending:
+                await self.discover_all(pending)
+    
+    def _ensure_all_discovered_sync(self):
+        """Blocking wrapper around _ensure_all_discovered for sync callers"""
+        if not self._pending_discovery():
+            return
+        
+        if threading.current_thread() is self._loop_thread:
+            # Can't block here; async callers await _ensure_all_discovered first
+            logger.debug("Skipping lazy discovery on the manager's event loop")
+            return
+        
+        if self._closed:
+            logger.debug("Skipping lazy discovery on a closed manager")
+            return
+        
+        self._run(self._ensure_all_discovered())
+    
+    async def _discover_one(self, server_name: str) -> int:
+        """
+        Connect to one server and register its tools.
+        
+        Args:
+            server_name: The name of the server
             
-            # Register each tool
-            tool_count = 0
-            for tool in tools:
+        Returns:
+            Number of tools discovered
+        """
+        # Serve from the disk cache when the catalog is still fresh
+        cache_key = self.servers[server_name]['cache_key']
+        entry = self._load_cache().get(cache_key)
+        if entry and time.time() - entry.get('saved_at', 0) < self.CATALOG_TTL:
+            for tool in entry['tools']:
                 self._register_tool(server_name, tool)
-                tool_count += 1
-            
-            # Update server status
             self.servers[server_name]['status'] = 'ready'
-            
-            return tool_count
-        except Exception as e:
-            logger.error(f"Error discovering tools from {server_name}: {e}")
-            self.servers[server_name]['status'] = 'error'
+            self._discovered.add(server_name)
+            self._discovery_failed_at.pop(server_name, None)
+            return len(entry['tools'])
+        
+        client = self.clients[server_name]
+        
+        # Connect to the server
+        connected = await client.connect()
+        if not connected:
+            logger.error(f"Failed to connect to {server_name}")
+            self.servers[server_name]['status'] = 'connection_error'
             return 0
+        
+        # List tools from the server
+        tools = await client.list_tools()
+        
+        # Register each tool
+        tool_count = 0
+        for tool in tools:
+            self._register_tool(server_name, tool)
+            tool_count += 1
+        
+        # Update server status
+        self.servers[server_name]['status'] = 'ready'
+        self._discovered.add(server_name)
+        self._discovery_failed_at.pop(server_name, None)
+        
+        # Persist the catalog for the next process
+        catalog = self._load_cache()
+        catalog[cache_key] = {
+            'saved_at': time.time(),
+            'tools': [self._tool_to_dict(tool) for tool in tools]
+        }
+        self._save_cache(catalog)
+        
+        return tool_count
+    
+    @staticmethod
+    def _tool_to_dict(tool: Any) -> Dict[str, Any]:
+        """Convert an MCP Tool (or dict) to a JSON-serializable dict"""
+        if hasattr(tool, 'model_dump'):
+            return tool.model_dump(mode='json', exclude_none=True)
+        return dict(tool)
+    
+    def _load_cache(self) -> Dict[str, Any]:
+        """Load the tool catalog cache, returning {} if missing or unreadable"""
+        try:
+            return orjson.loads(self._cache_path.read_bytes())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable tool catalog cache: {e}")
+            return {}
     
-    def _register_tool(self, server_name: str, tool: Dict[str, Any]):
+    def _forget_catalog(self, cache_key: str):
+        """Drop a cached catalog unless another registered server shares it"""
+        if any(server['cache_key'] == cache_key for server in self.servers.values()):
+            return
+        catalog = self._load_cache()
+        if catalog.pop(cache_key, None) is not None:
+            self._save_cache(catalog)
+    
+    def _save_cache(self, catalog: Dict[str, Any]):
+        """Atomically write the tool catalog cache"""
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._cache_path.with_suffix('.tmp')
+            tmp_path.write_bytes(orjson.dumps(catalog))
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write tool catalog cache: {e}")
+    
+    def _register_tool(self, server_name: str, tool: Any):
         """Register a tool with name translation for Bedrock compatibility"""
-        tool_name = getattr(tool, 'name', tool.get('name', ''))
+        # Discovery yields MCP Tool objects, the disk cache yields dicts;
+        # read either shape once so later code sees only plain dicts
+        if isinstance(tool, dict):
+            tool_name = tool.get('name')
+            description = tool.get('description')
+            input_schema = tool.get('inputSchema')
+        else:
+            tool_name = getattr(tool, 'name', None)
+            description = getattr(tool, 'description', None)
+            input_schema = getattr(tool, 'inputSchema', None)
         if not tool_name:
             return
         
         # For Bedrock compatibility, replace hyphens with underscores
         bedrock_name = f"{server_name}_{tool_name.replace('-', '_')}"
         
+        self._tool_config_cache = None
+        
         # Store the mapping
         self.tool_mapping[bedrock_name] = {
             'server': server_name,
             'method': tool_name
         }
+        self._server_bedrock_names.setdefault(server_name, set()).add(bedrock_name)
+        self._dispatch[bedrock_name] = (server_name, self.clients.get(server_name), tool_name)
         
-        # Store the tool details in the server
-        self.servers[server_name]['tools'][tool_name] = tool
+        # Store the normalized tool details in the server
+        self.servers[server_name]['tools'][tool_name] = {
+            'name': tool_name,
+            'description': description or '',
+            'inputSchema': self._schema_to_dict(input_schema or {}),
+            '_bedrock_name': bedrock_name
+        }
+    
+    @staticmethod
+    def _schema_to_dict(schema: Any) -> Dict[str, Any]:
+        """Convert a pydantic model or dataclass schema to a plain dict"""
+        if isinstance(schema, dict):
+            return schema
+        if hasattr(schema, 'model_dump'):
+            return schema.model_dump()
+        if hasattr(schema, 'dict'):
+            return schema.dict()
+        if dataclasses.is_dataclass(schema):
+            return dataclasses.asdict(schema)
+        return dict(schema)
     
     def get_bedrock_tool_config(self) -> Dict[str, Any]:
         """
@@ -168,6 +459,14 @@ class MCPServerManager:
         Returns:
             Tool configuration compatible with Bedrock API
         """
+        # Only block on discovery when a server is due for it
+        if self._pending_discovery():
+            self._ensure_all_discovered_sync()
+        
+        # Schemas only change on register/remove/discover
+        if self._tool_config_cache is not None:
+            return self._tool_config_cache
+        
         tool_specs = []
         
         for bedrock_name, mapping in self.tool_mapping.items():
@@ -183,27 +482,21 @@ class MCPServerManager:
             if not tool:
                 continue
             
-            # Get description and schema
-            description = getattr(tool, 'description', tool.get('description', ''))
-            input_schema = getattr(tool, 'inputSchema', tool.get('inputSchema', {}))
-            
-            if not isinstance(input_schema, dict):
-                input_schema = json.loads(json.dumps(input_schema))
-            
-            # Create tool spec
+            # Create tool spec; tools were normalized at registration
             tool_spec = {
                 "toolSpec": {
                     "name": bedrock_name,
-                    "description": f"{server_name}: {description}",
+                    "description": f"{server_name}: {tool['description']}",
                     "inputSchema": {
-                        "json": input_schema
+                        "json": tool['inputSchema']
                     }
                 }
             }
             
             tool_specs.append(tool_spec)
         
-        return {"tools": tool_specs}
+        self._tool_config_cache = {"tools": tool_specs}
+        return self._tool_config_cache
     
     async def call_tool(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -214,18 +507,17 @@ class MCPServerManager:
             params: Tool parameters
             
         Returns:
-            Tool result
+            {"content": ...} on success or {"error": ...} on failure
         """
-        # Find the mapping for this tool
-        mapping = self.tool_mapping.get(tool_name)
-        if not mapping:
+        # One lookup resolves the client and method, discovering lazily on a miss
+        target = self._dispatch.get(tool_name)
+        if target is None:
+            await self._ensure_all_discovered()
+            target = self._dispatch.get(tool_name)
+        if target is None:
             return {"error": f"Unknown tool: {tool_name}"}
         
-        server_name = mapping['server']
-        method_name = mapping['method']
-        
-        # Get client for this server
-        client = self.clients.get(server_name)
+        server_name, client, method_name = target
         if not client:
             return {"error": f"No client for server: {server_name}"}
         
@@ -245,11 +537,61 @@ class MCPServerManager:
             # Don't disconnect - we'll maintain the connection for future calls
             pass
     
+    async def call_tools_batch(self, calls: List[Tuple[str, Dict[str, Any]]],
+                               concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Call several tools concurrently.
+        
+        Identical (tool_name, params) pairs in the batch are called once and
+        share the same result object.
+        
+        Args:
+            calls: List of (bedrock_name, params) pairs
+            concurrency: Maximum number of tool calls in flight
+            
+        Returns:
+            Results in the same order as calls
+        """
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def _one(tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+            async with sem:
+                return await self.call_tool(tool_name, params)
+        
+        unique = {}  # Map of (tool_name, canonical params) to its coroutine
+        keys = []
+        for tool_name, params in calls:
+            key = (tool_name, json.dumps(params, sort_keys=True, default=str))
+            if key not in unique:
+                unique[key] = _one(tool_name, params)
+            keys.append(key)
+        
+        results = await asyncio.gather(*unique.values(), return_exceptions=True)
+        
+        by_key = {}
+        for key, result in zip(unique, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error calling tool {key[0]}: {result}")
+                result = {"error": str(result)}
+            by_key[key] = result
+        return [by_key[key] for key in keys]
+    
     def close_all(self):
-        """Close all client connections"""
+        """Close all client connections and stop the manager's event loop"""
+        if self._closed:
+            return
+        self._closed = True
+        
+        futures = {}
         for server_name, client in self.clients.items():
-            try:
-                self._ensure_event_loop()
-                asyncio.run_coroutine_threadsafe(client.disconnect(), self.event_loop)
-            except Exception as e:
-                logger.error(f"Error closing client for {server_name}: {e}")
\ No newline at end of file
+            futures[asyncio.run_coroutine_threadsafe(client.disconnect(), self.event_loop)] = server_name
+        
+        done, not_done = concurrent.futures.wait(futures, timeout=5)
+        for future in done:
+            if future.exception():
+                logger.error(f"Error closing client for {futures[future]}: {future.exception()}")
+        for future in not_done:
+            logger.error(f"Timed out closing client for {futures[future]}")
+        
+        self.event_loop.call_soon_threadsafe(self.event_loop.stop)
+        self._loop_thread.join(timeout=5)
\ No newline at end of file